@@ -10,18 +10,75 @@ Usage:
 """
 
 import argparse
+import bisect
+import hashlib
 import json
+import mmap
+import os
 import re
 import sys
-from dataclasses import dataclass, field
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, fields
 from datetime import datetime
+from functools import cached_property
+from itertools import chain, islice
+from operator import attrgetter, mul
 from pathlib import Path
-from typing import Optional
-
-
-@dataclass
+from typing import Optional, Sequence, Union
+
+try:
+    # google-re2 matches in linear time; used for the factor scan when installed
+    import re2 as _factor_re
+    _factor_re.Options  # other packages named re2 have a different API
+except (ImportError, AttributeError):
+    _factor_re = re
+
+# Title patterns, searched in order against the decoded document head
+_TITLE_RXES = [
+    re.compile(r"#\s*(?:PRD|Feature|Product Requirements):\s*(.+)", re.IGNORECASE),
+    re.compile(r"#\s*(.+?)(?:\n|$)", re.IGNORECASE),
+    re.compile(r"(?:feature|project):\s*(.+?)(?:\n|$)", re.IGNORECASE),
+]
+
+# Project name patterns, searched in order against the decoded document head.
+# The second one backtracks over every run of words following "for"/"in",
+# which is quadratic in the length of the run; keep the text it searches short.
+_PROJECT_RXES = [
+    re.compile(r"project:\s*(.+?)(?:\n|$)", re.IGNORECASE),
+    re.compile(r"(?:for|in)\s+(?:the\s+)?([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)\s+(?:project|app|application)", re.IGNORECASE),
+]
+
+_KEBAB_RX = re.compile(r"[^a-z0-9]+")
+
+# Score weight of each complexity factor
+_FACTOR_WEIGHTS = {
+    "functional_requirements": 2,
+    "integration_points": 3,
+    "ui_components": 1.5,
+    "database_changes": 2,
+    "external_apis": 3,
+    "authentication_features": 4,
+    "file_operations": 1.5,
+    "real_time_features": 3,
+}
+_get_factor_counts = attrgetter(*_FACTOR_WEIGHTS)
+
+# Inclusive upper score bound of each category but the last
+_CATEGORY_BOUNDS = (5, 15, 30)
+_CATEGORIES = ("simple", "medium", "complex", "enterprise")
+
+# Shared default for empty acceptance criteria; copied to a list on append
+_EMPTY: tuple = ()
+
+
+@dataclass(frozen=True)
 class ComplexityFactors:
-    """Factors that contribute to overall complexity."""
+    """Factors that contribute to overall complexity.
+
+    Instances are frozen so derived values can be cached on first access.
+    The cache lives in the instance __dict__, which is why this class has no
+    __slots__; there is only one instance per analysis.
+    """
     functional_requirements: int = 0
     integration_points: int = 0
     ui_components: int = 0
@@ -31,34 +88,21 @@ class ComplexityFactors:
     file_operations: int = 0
     real_time_features: int = 0
 
-    def calculate_score(self) -> float:
-        """Calculate weighted complexity score."""
-        return (
-            self.functional_requirements * 2 +
-            self.integration_points * 3 +
-            self.ui_components * 1.5 +
-            self.database_changes * 2 +
-            self.external_apis * 3 +
-            self.authentication_features * 4 +
-            self.file_operations * 1.5 +
-            self.real_time_features * 3
-        ) / 5
-
-    def get_category(self) -> str:
-        """Get complexity category based on score."""
-        score = self.calculate_score()
-        if score <= 5:
-            return "simple"
-        elif score <= 15:
-            return "medium"
-        elif score <= 30:
-            return "complex"
-        else:
-            return "enterprise"
-
-    def get_story_count_range(self) -> tuple[int, int]:
-        """Get recommended story count range."""
-        category = self.get_category()
+    @cached_property
+    def score(self) -> float:
+        """Weighted complexity score."""
+        counts = _get_factor_counts(self)
+        return sum(map(mul, _FACTOR_WEIGHTS.values(), counts)) / 5
+
+    @cached_property
+    def category(self) -> str:
+        """Complexity category based on score."""
+        return _CATEGORIES[bisect.bisect_left(_CATEGORY_BOUNDS, self.score)]
+
+    @cached_property
+    def story_count_range(self) -> tuple[int, int]:
+        """Recommended story count range."""
+        category = self.category
         ranges = {
             "simple": (3, 5),
             "medium": (6, 12),
@@ -67,30 +111,37 @@ class ComplexityFactors:
         }
         return ranges.get(category, (6, 12))
 
-    def get_iteration_estimate(self) -> tuple[int, int]:
-        """Get estimated iteration count range."""
-        min_stories, max_stories = self.get_story_count_range()
+    @cached_property
+    def iteration_estimate(self) -> tuple[int, int]:
+        """Estimated iteration count range."""
+        min_stories, max_stories = self.story_count_range
         # Account for potential handoffs and retries
         return (min_stories, int(max_stories * 1.5))
 
 
-@dataclass
+@dataclass(slots=True)
 class UserStory:
     """Represents a user story for the PRD."""
     id: str
     title: str
     description: str
-    acceptance_criteria: list[str] = field(default_factory=list)
+    acceptance_criteria: Sequence[str] = _EMPTY
     priority: int = 1
     passes: bool = False
     notes: str = ""
 
+    def add_ac(self, criterion: str) -> None:
+        """Append an acceptance criterion."""
+        if not isinstance(self.acceptance_criteria, list):
+            self.acceptance_criteria = list(self.acceptance_criteria)
+        self.acceptance_criteria.append(criterion)
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
             "title": self.title,
             "description": self.description,
-            "acceptanceCriteria": self.acceptance_criteria,
+            "acceptanceCriteria": list(self.acceptance_criteria),
             "priority": self.priority,
             "passes": self.passes,
             "notes": self.notes,
@@ -100,6 +151,17 @@ class UserStory:
 class ComplexityAnalyzer:
     """Analyzes document complexity and generates sized stories."""
 
+    # Matches beyond this are not counted toward a factor
+    MAX_FACTOR_COUNT = 20
+
+    # Part of the cache key; bump whenever the counting logic changes so that
+    # results cached by earlier versions are not reused
+    _CACHE_VERSION = 1
+
+    # Titles and project names live at the top of the document; only this
+    # much is decoded and searched for them
+    HEAD_SIZE = 2048
+
     # Patterns to detect various complexity factors
     PATTERNS = {
         "functional_requirements": [
@@ -112,14 +174,12 @@ class ComplexityAnalyzer:
             r"integrat(?:e|ion|ing)\s+with",
             r"connect(?:s|ing)?\s+to",
             r"(?:third[- ]party|external)\s+(?:service|system|api)",
-            r"webhook[s]?",
             r"(?:import|export)\s+(?:from|to)",
         ],
         "ui_components": [
             r"(?:button|form|modal|dialog|dropdown|menu|table|list|card|panel)",
             r"(?:page|screen|view|component|widget)",
             r"(?:display|show|render|present)",
-            r"UI/UX",
             r"(?:click|tap|hover|drag|drop)",
         ],
         "database_changes": [
@@ -152,70 +212,184 @@ class ComplexityAnalyzer:
         ],
     }
 
-    def __init__(self, content: str, arch_content: Optional[str] = None):
-        self.content = content.lower()
-        self.arch_content = (arch_content or "").lower()
-        self.combined_content = f"{self.content}\n{self.arch_content}"
+    # Fixed-string patterns, counted with bytes.count on lower-cased text
+    # instead of the regex engine ("webhook" also covers "webhooks")
+    _LITERAL_PATTERNS = {
+        "integration_points": [b"webhook"],
+        "ui_components": [b"ui/ux"],
+    }
 
-    def analyze(self) -> ComplexityFactors:
-        """Analyze document and return complexity factors."""
-        factors = ComplexityFactors()
+    # Patterns compiled once, as bytes patterns so documents are matched
+    # without decoding them. Case folding is requested inline because RE2
+    # takes an options object rather than re flags. Patterns are not fused
+    # into one regex, per factor or overall: they share vocabulary ("api" /
+    # "api key", "table"), and an alternation would credit each such match to
+    # only one of them.
+    _COMPILED_PATTERNS = {
+        name: [_factor_re.compile(b"(?i)" + p.encode()) for p in patterns]
+        for name, patterns in PATTERNS.items()
+    }
 
-        for factor_name, patterns in self.PATTERNS.items():
-            count = 0
-            for pattern in patterns:
-                matches = re.findall(pattern, self.combined_content, re.IGNORECASE)
-                count += len(matches)
-            setattr(factors, factor_name, min(count, 20))  # Cap at 20 per factor
+    def __init__(
+        self,
+        content: Union[bytes, mmap.mmap],
+        arch_content: Optional[Union[bytes, mmap.mmap]] = None,
+        cache_dir: Optional[Path] = None,
+    ):
+        self.content = content
+        self.arch_content = arch_content or b""
+        self._head = content[:self.HEAD_SIZE].decode("utf-8", "ignore")
+        # Scanned one after the other rather than concatenated into a copy
+        self._buffers = [self.content]
+        if self.arch_content:
+            self._buffers.append(self.arch_content)
+        self.cache_dir = cache_dir
 
+    def analyze(self) -> ComplexityFactors:
+        """Analyze document and return complexity factors.
+
+        With a cache_dir, results are reused across runs for unchanged
+        documents. An unreadable, malformed or unwritable cache entry is
+        ignored and rewritten.
+        """
+        if self.cache_dir is None:
+            return self._analyze_uncached()
+
+        cache_path = self.cache_dir / f"{self._cache_key()}.json"
+        try:
+            cached = json.loads(cache_path.read_text())
+        except (OSError, ValueError):
+            cached = None
+        if (
+            isinstance(cached, dict)
+            and cached.keys() == {f.name for f in fields(ComplexityFactors)}
+            and all(type(count) is int for count in cached.values())
+        ):
+            return ComplexityFactors(**cached)
+
+        factors = self._analyze_uncached()
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(json.dumps(asdict(factors)))
+        except OSError:
+            pass
         return factors
 
+    def _cache_key(self) -> str:
+        """Digest of the documents and of everything that affects the counts."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((
+            self._CACHE_VERSION,
+            self.PATTERNS,
+            self._LITERAL_PATTERNS,
+            self.MAX_FACTOR_COUNT,
+        )).encode())
+        for buffer in self._buffers:
+            # Length prefix keeps the PRD/architecture boundary unambiguous
+            digest.update(len(buffer).to_bytes(8, "little"))
+            digest.update(buffer)
+        return digest.hexdigest()
+
+    def _analyze_uncached(self) -> ComplexityFactors:
+        """Scan the documents for every complexity factor."""
+        return ComplexityFactors(**{
+            factor_name: self._count_matches(factor_name)
+            for factor_name in self._COMPILED_PATTERNS
+        })
+
+    def _count_matches(self, factor_name: str) -> int:
+        """Count a factor's matches across all buffers, up to the cap."""
+        # finditer is lazy, so scanning stops once the cap is reached
+        matches = chain.from_iterable(
+            pattern.finditer(buffer)
+            for pattern in self._COMPILED_PATTERNS[factor_name]
+            for buffer in self._buffers
+        )
+        count = sum(1 for _ in islice(matches, self.MAX_FACTOR_COUNT))
+
+        for literal in self._LITERAL_PATTERNS.get(factor_name, ()):
+            if count >= self.MAX_FACTOR_COUNT:
+                break
+            count += sum(
+                _count_literal(buffer, literal) for buffer in self._buffers
+            )
+
+        return min(count, self.MAX_FACTOR_COUNT)
+
     def extract_feature_name(self) -> str:
         """Extract feature name from document."""
-        # Look for title patterns
-        title_patterns = [
-            r"#\s*(?:PRD|Feature|Product Requirements):\s*(.+)",
-            r"#\s*(.+?)(?:\n|$)",
-            r"(?:feature|project):\s*(.+?)(?:\n|$)",
-        ]
-
-        for pattern in title_patterns:
-            match = re.search(pattern, self.content, re.IGNORECASE)
+        for pattern in _TITLE_RXES:
+            match = pattern.search(self._head)
             if match:
                 title = match.group(1).strip()
                 # Convert to kebab-case
-                return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+                return _KEBAB_RX.sub("-", title.lower()).strip("-")
 
         return "feature"
 
     def extract_project_name(self) -> str:
         """Extract project name from document."""
-        patterns = [
-            r"project:\s*(.+?)(?:\n|$)",
-            r"(?:for|in)\s+(?:the\s+)?([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)\s+(?:project|app|application)",
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, self.content, re.IGNORECASE)
+        for pattern in _PROJECT_RXES:
+            match = pattern.search(self._head)
             if match:
-                return match.group(1).strip()
+                return match.group(1).strip().lower()
 
         return "Project"
 
 
+def _count_literal(
+    buffer: Union[bytes, mmap.mmap], literal: bytes, block_size: int = 1 << 20
+) -> int:
+    """Count case-insensitive occurrences of a lower-case literal.
+
+    The buffer is lower-cased one block at a time so that a mapped document
+    is never copied whole. Blocks overlap by len(literal) - 1 bytes, so a
+    match is seen whole in the block where it starts and only there; this
+    assumes the literal cannot overlap itself.
+    """
+    overlap = len(literal) - 1
+    return sum(
+        buffer[start:start + block_size + overlap].lower().count(literal)
+        for start in range(0, len(buffer), block_size)
+    )
+
+
+def default_cache_dir() -> Optional[Path]:
+    """Per-user directory for cached analysis results, if one can be found."""
+    base = os.environ.get("XDG_CACHE_HOME")
+    if not base:
+        try:
+            base = Path.home() / ".cache"
+        except RuntimeError:
+            return None
+    return Path(base) / "claude-agent-loop" / "factors"
+
+
+def map_document(path: Path, stack: ExitStack) -> Union[bytes, mmap.mmap]:
+    """Memory-map a document for the lifetime of stack.
+
+    Falls back to reading the file when it cannot be mapped (empty files,
+    pipes).
+    """
+    file = stack.enter_context(path.open("rb"))
+    try:
+        return stack.enter_context(
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        )
+    except (OSError, ValueError):
+        return file.read()
+
+
 def generate_prd_json(
-    content: str,
-    arch_content: Optional[str],
+    analyzer: ComplexityAnalyzer,
+    factors: ComplexityFactors,
     output_path: Path,
 ) -> dict:
-    """Generate prd.json from analyzed content."""
-    analyzer = ComplexityAnalyzer(content, arch_content)
-    factors = analyzer.analyze()
-
-    score = factors.calculate_score()
-    category = factors.get_category()
-    min_stories, max_stories = factors.get_story_count_range()
-    min_iter, max_iter = factors.get_iteration_estimate()
+    """Generate prd.json from the analyzer and its analysis results."""
+    score = factors.score
+    category = factors.category
+    min_stories, max_stories = factors.story_count_range
+    min_iter, max_iter = factors.iteration_estimate
 
     feature_name = analyzer.extract_feature_name()
     project_name = analyzer.extract_project_name()
@@ -252,31 +426,36 @@ def generate_prd_json(
 
 def print_analysis(factors: ComplexityFactors) -> None:
     """Print analysis results."""
-    score = factors.calculate_score()
-    category = factors.get_category()
-    min_stories, max_stories = factors.get_story_count_range()
-    min_iter, max_iter = factors.get_iteration_estimate()
-
-    print("\n" + "=" * 50)
-    print("  Complexity Analysis Results")
-    print("=" * 50)
-
-    print(f"\n  Complexity Score: {score:.1f}")
-    print(f"  Category: {category.upper()}")
-    print(f"  Recommended Stories: {min_stories}-{max_stories}")
-    print(f"  Estimated Iterations: {min_iter}-{max_iter}")
-
-    print("\n  Factor Breakdown:")
-    print(f"    Functional Requirements: {factors.functional_requirements}")
-    print(f"    Integration Points: {factors.integration_points}")
-    print(f"    UI Components: {factors.ui_components}")
-    print(f"    Database Changes: {factors.database_changes}")
-    print(f"    External APIs: {factors.external_apis}")
-    print(f"    Authentication: {factors.authentication_features}")
-    print(f"    File Operations: {factors.file_operations}")
-    print(f"    Real-time Features: {factors.real_time_features}")
-
-    print("\n" + "=" * 50)
+    score = factors.score
+    category = factors.category
+    min_stories, max_stories = factors.story_count_range
+    min_iter, max_iter = factors.iteration_estimate
+
+    lines = [
+        "",
+        "=" * 50,
+        "  Complexity Analysis Results",
+        "=" * 50,
+        "",
+        f"  Complexity Score: {score:.1f}",
+        f"  Category: {category.upper()}",
+        f"  Recommended Stories: {min_stories}-{max_stories}",
+        f"  Estimated Iterations: {min_iter}-{max_iter}",
+        "",
+        "  Factor Breakdown:",
+        f"    Functional Requirements: {factors.functional_requirements}",
+        f"    Integration Points: {factors.integration_points}",
+        f"    UI Components: {factors.ui_components}",
+        f"    Database Changes: {factors.database_changes}",
+        f"    External APIs: {factors.external_apis}",
+        f"    Authentication: {factors.authentication_features}",
+        f"    File Operations: {factors.file_operations}",
+        f"    Real-time Features: {factors.real_time_features}",
+        "",
+        "=" * 50,
+    ]
+    # One write instead of a print call per line
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main():
@@ -299,6 +478,11 @@ def main():
         action="store_true",
         help="Only print analysis, don't generate prd.json",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't reuse or store analysis results in the user cache directory",
+    )
 
     args = parser.parse_args()
 
@@ -308,30 +492,35 @@ def main():
         print(f"Error: PRD file not found: {prd_path}")
         sys.exit(1)
 
-    content = prd_path.read_text()
-
-    # Read architecture file if provided
-    arch_content = None
-    if args.arch_file:
-        arch_path = Path(args.arch_file)
-        if arch_path.exists():
-            arch_content = arch_path.read_text()
-        else:
-            print(f"Warning: Architecture file not found: {arch_path}")
-
-    # Analyze
-    analyzer = ComplexityAnalyzer(content, arch_content)
-    factors = analyzer.analyze()
-    print_analysis(factors)
-
-    if args.analyze_only:
-        return
-
-    # Generate prd.json
-    output_path = Path(args.output)
-    prd = generate_prd_json(content, arch_content, output_path)
-
-    output_path.write_text(json.dumps(prd, indent=2))
+    # Documents stay mapped until analysis is done
+    with ExitStack() as stack:
+        content = map_document(prd_path, stack)
+
+        # Read architecture file if provided
+        arch_content = None
+        if args.arch_file:
+            arch_path = Path(args.arch_file)
+            if arch_path.exists():
+                arch_content = map_document(arch_path, stack)
+            else:
+                print(f"Warning: Architecture file not found: {arch_path}")
+
+        # Analyze
+        cache_dir = None if args.no_cache else default_cache_dir()
+        analyzer = ComplexityAnalyzer(content, arch_content, cache_dir)
+        factors = analyzer.analyze()
+        print_analysis(factors)
+
+        if args.analyze_only:
+            return
+
+        # Generate prd.json
+        output_path = Path(args.output)
+        prd = generate_prd_json(analyzer, factors, output_path)
+
+    # Streamed to the file instead of building the whole string first
+    with output_path.open("w", encoding="utf-8") as f:
+        json.dump(prd, f, indent=2)
     print(f"\n  Generated: {output_path}")
     print("  Note: User stories need to be populated manually or via /autonomous-agent-loop convert")
 